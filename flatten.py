@@ -0,0 +1,39 @@
+"""
+Flattens raw Jira issues into the rows served by /simplified-jira-issues.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# Shared fallback for missing Jira fields; never mutated, so "or _EMPTY" costs no allocation
+_EMPTY: Dict[str, Any] = {}
+
+
+@dataclass(slots=True)
+class SimplifiedIssue:
+    issue_key: str
+    summary: str
+    issue_type: str
+    parent: Optional[str]
+    status: str
+    assignee: str
+    reporter: str
+
+
+def flatten_issue(issue: Dict[str, Any]) -> SimplifiedIssue:
+    fields: Dict[str, Any] = issue.get("fields") or _EMPTY
+    # Jira sends null for unset values, so every string falls back with "or" instead of a .get() default
+    issue_type: str = (fields.get("issuetype") or _EMPTY).get("name") or ""
+    parent_key: Optional[str] = None if issue_type == "Epic" else (fields.get("parent") or _EMPTY).get("key")
+    return SimplifiedIssue(
+        issue.get("key") or "",
+        fields.get("summary") or "",
+        issue_type,
+        parent_key,
+        (fields.get("status") or _EMPTY).get("name") or "",
+        (fields.get("assignee") or _EMPTY).get("displayName") or "N/A",
+        (fields.get("reporter") or _EMPTY).get("displayName") or "N/A",
+    )
+
+
+def flatten_issues(issues: List[Dict[str, Any]]) -> List[SimplifiedIssue]:
+    return [flatten_issue(issue) for issue in issues]
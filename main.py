@@ -1,20 +1,33 @@
+import base64
+import hashlib
 import logging
 import json
 import os
-import requests
-from fastapi import FastAPI, HTTPException, Query, Depends
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+import httpx
+import ijson
+import orjson
+import uvicorn
+from fastapi import FastAPI, HTTPException, Query, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from requests.auth import HTTPBasicAuth
 from pydantic_settings import BaseSettings
 from typing import List, Optional
 from datetime import datetime
 
 # --- SQLAlchemy Database Imports ---
-from sqlalchemy import create_engine, Column, Integer, String, Text, Enum, TIMESTAMP, ForeignKey, JSON
-from sqlalchemy.orm import sessionmaker, Session, declarative_base
+from sqlalchemy import create_engine, bindparam, lambda_stmt, select, String, Text, Enum, TIMESTAMP, ForeignKey, JSON
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker, Session, DeclarativeBase, Mapped, mapped_column, relationship, joinedload
 from sqlalchemy.sql import func
 
+from flatten import flatten_issue, flatten_issues
+
 logging.basicConfig(level=logging.INFO)
 
 
@@ -26,12 +39,39 @@ class Settings(BaseSettings):
     db_host: str
     db_name: str
 
+    # Worker processes, and the MySQL connections all of them may open together.
+    # The default budget stays under MySQL's default max_connections of 151.
+    web_concurrency: int = 4
+    db_max_connections: int = 120
+
     class Config:
         env_file = ".env"
 
 
 settings = Settings()
-app = FastAPI()
+
+
+# --- Shared Jira HTTP Client ---
+# One pooled client per process so Jira connections are kept alive across requests
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.http = httpx.AsyncClient(
+        # Retries cover connection failures only; the limits live on the transport that owns the pool
+        transport=httpx.AsyncHTTPTransport(
+            retries=3,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        ),
+        timeout=httpx.Timeout(30.0, connect=3.05),
+        follow_redirects=True,
+        # Jira issue JSON compresses well; httpx decodes br via the brotli package
+        headers={"Accept": "application/json", "Accept-Encoding": "gzip, br"},
+    )
+    yield
+    await app.state.http.aclose()
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # --- CORS Middleware ---
 app.add_middleware(
@@ -42,50 +82,106 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Response Compression ---
+# GZipMiddleware buffers a response until zlib flushes, which would hold back the
+# streaming endpoints' early chunks, so those paths are sent uncompressed
+UNCOMPRESSED_PATHS = {"/requests/stream", "/simplified-jira-issues/stream"}
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in UNCOMPRESSED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024)
+
 # --- Database Setup ---
 DATABASE_URL = f"mysql+pymysql://{settings.db_user}:{settings.db_password}@{settings.db_host}/{settings.db_name}"
+ASYNC_DATABASE_URL = f"mysql+aiomysql://{settings.db_user}:{settings.db_password}@{settings.db_host}/{settings.db_name}"
 
-engine = create_engine(DATABASE_URL)
+ENGINE_OPTIONS = dict(
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    query_cache_size=1200,
+    connect_args={"charset": "utf8mb4"},
+)
+
+# Each worker process gets an equal share of the connection budget and splits it 4:1 between
+# the sync engine and the async engine, half as a steady pool and half as overflow.
+# pool_size=0 would mean "unlimited" to SQLAlchemy, hence the floor of 10 per process.
+_worker_connections = max(settings.db_max_connections // settings.web_concurrency, 10)
+_sync_connections = _worker_connections * 4 // 5
+_async_connections = _worker_connections - _sync_connections
+
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=_sync_connections // 2,
+    max_overflow=_sync_connections - _sync_connections // 2,
+    **ENGINE_OPTIONS,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+
+# Async engine for endpoints that should not hold a threadpool worker while waiting on MySQL.
+# It only serves /full_log, so it gets the smaller share of the budget.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=_async_connections // 2,
+    max_overflow=_async_connections - _async_connections // 2,
+    **ENGINE_OPTIONS,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+class Base(DeclarativeBase):
+    pass
 
 
 # --- SQLAlchemy ORM Models ---
 class GenerationRequestDB(Base):
     __tablename__ = "generation_requests"
-    request_id = Column(Integer, primary_key=True, index=True)
-    request_type = Column(Enum('developer', 'client'), nullable=False)
-    raw_input = Column(Text, nullable=False)
-    repository = Column(String(255))
-    assignee_email = Column(String(255))
-    request_timestamp = Column(TIMESTAMP, server_default=func.now())
+    request_id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    request_type: Mapped[str] = mapped_column(Enum('developer', 'client'))
+    raw_input: Mapped[str] = mapped_column(Text)
+    repository: Mapped[Optional[str]] = mapped_column(String(255))
+    assignee_email: Mapped[Optional[str]] = mapped_column(String(255))
+    request_timestamp: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, server_default=func.now())
+
+    classification: Mapped[Optional["ClassificationLogDB"]] = relationship(back_populates="request", lazy="raise")
+    ticket: Mapped[Optional["GeneratedTicketDB"]] = relationship(back_populates="request", lazy="raise")
 
 
 class ClassificationLogDB(Base):
     __tablename__ = "classification_logs"
-    log_id = Column(Integer, primary_key=True, index=True)
-    request_id = Column(Integer, ForeignKey("generation_requests.request_id"))
-    model_name = Column(String(100), nullable=False)
-    decision = Column(Enum('approved', 'rejected'), nullable=False)
-    rejection_reason = Column(String(255))
-    raw_response_json = Column(JSON)
-    processed_timestamp = Column(TIMESTAMP, server_default=func.now())
+    log_id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    request_id: Mapped[Optional[int]] = mapped_column(ForeignKey("generation_requests.request_id"), index=True)
+    model_name: Mapped[str] = mapped_column(String(100))
+    decision: Mapped[str] = mapped_column(Enum('approved', 'rejected'))
+    rejection_reason: Mapped[Optional[str]] = mapped_column(String(255))
+    raw_response_json: Mapped[Optional[dict]] = mapped_column(JSON)
+    processed_timestamp: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, server_default=func.now())
+
+    request: Mapped[Optional["GenerationRequestDB"]] = relationship(back_populates="classification", lazy="raise")
 
 
 class GeneratedTicketDB(Base):
     __tablename__ = "generated_tickets"
-    ticket_log_id = Column(Integer, primary_key=True, index=True)
-    request_id = Column(Integer, ForeignKey("generation_requests.request_id"))
-    classification_log_id = Column(Integer, ForeignKey("classification_logs.log_id"))
-    jira_issue_key = Column(String(50), nullable=False, unique=True)
-    jira_issue_id = Column(String(50), nullable=False)
-    summary = Column(Text, nullable=False)
-    issue_type = Column(String(50), nullable=False)
-    parent_issue_key = Column(String(50))
-    assignee_account_id = Column(String(100))
-    generated_by_model = Column(String(100), nullable=False)
-    raw_generated_json = Column(JSON)
-    creation_timestamp = Column(TIMESTAMP, server_default=func.now())
+    ticket_log_id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    request_id: Mapped[Optional[int]] = mapped_column(ForeignKey("generation_requests.request_id"), index=True)
+    classification_log_id: Mapped[Optional[int]] = mapped_column(ForeignKey("classification_logs.log_id"), index=True)
+    jira_issue_key: Mapped[str] = mapped_column(String(50), unique=True)
+    jira_issue_id: Mapped[str] = mapped_column(String(50))
+    summary: Mapped[str] = mapped_column(Text)
+    issue_type: Mapped[str] = mapped_column(String(50))
+    parent_issue_key: Mapped[Optional[str]] = mapped_column(String(50))
+    assignee_account_id: Mapped[Optional[str]] = mapped_column(String(100))
+    generated_by_model: Mapped[str] = mapped_column(String(100))
+    raw_generated_json: Mapped[Optional[dict]] = mapped_column(JSON)
+    creation_timestamp: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, server_default=func.now())
+
+    request: Mapped[Optional["GenerationRequestDB"]] = relationship(back_populates="ticket", lazy="raise")
 
 
 # Dependency to get a DB session
@@ -96,6 +192,13 @@ def get_db():
     finally:
         db.close()
 
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 class GenerationRequestResponse(BaseModel):
     request_id: int
     request_type: str
@@ -142,80 +245,278 @@ class FullLogResponse(BaseModel):
     ticket: Optional[GeneratedTicketResponse]
 
 # --- Existing Jira Endpoint ---
+@lru_cache(maxsize=256)
+def _basic_auth(email: str, api_token: str) -> str:
+    return "Basic " + base64.b64encode(f"{email}:{api_token}".encode()).decode()
+
+
+# Dashboards poll the same JQL every few seconds; serve repeats from memory for a short while.
+# Entries are LRU-ordered and only touched between awaits, so the event loop needs no lock.
+JIRA_CACHE_TTL = 15
+JIRA_CACHE_MAXSIZE = 128
+_jira_cache_salt = os.urandom(16)
+_jira_cache: OrderedDict = OrderedDict()
+
+
+def _jira_cache_key(jira_url: str, email: str, api_token: str) -> tuple:
+    # The cache key holds a salted digest instead of the raw token; it still separates credentials.
+    # (_basic_auth's lru_cache does retain the encoded credentials for up to 256 pairs.)
+    token_digest = hashlib.blake2b(api_token.encode(), key=_jira_cache_salt, digest_size=16).digest()
+    return jira_url, email, token_digest
+
+
+def _jira_cache_get(key: tuple) -> Optional[tuple]:
+    """
+    Returns the cached (body, etag, seconds_left) for a key, or None if missing or expired.
+    """
+    entry = _jira_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, body, etag = entry
+    seconds_left = expires_at - time.monotonic()
+    if seconds_left < 0:
+        del _jira_cache[key]
+        return None
+    _jira_cache.move_to_end(key)
+    return body, etag, int(seconds_left)
+
+
+def _jira_cache_put(key: tuple, body: bytes, etag: Optional[str]) -> None:
+    _jira_cache[key] = (time.monotonic() + JIRA_CACHE_TTL, body, etag)
+    _jira_cache.move_to_end(key)
+    while len(_jira_cache) > JIRA_CACHE_MAXSIZE:
+        _jira_cache.popitem(last=False)
+
+
+def _strong_etag(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def _weak_etag(etag: str) -> str:
+    # The body may be gzip-encoded or not under the same tag, so it is only weakly equal
+    return f"W/{_strong_etag(etag)}"
+
+
+def _jira_error(response: httpx.Response, jira_url: str) -> HTTPException:
+    # Client errors such as bad credentials are passed through; anything else from Jira is a bad gateway
+    status_code = response.status_code if 400 <= response.status_code < 500 else 502
+    return HTTPException(status_code=status_code, detail=f"Jira returned {response.status_code} for {jira_url}")
+
+
 @app.get("/simplified-jira-issues")
-def get_simplified_issues(
+async def get_simplified_issues(
+        request: Request,
         jira_url: str = Query(..., description="Jira API URL"),
         email: str = Query(..., description="Your Jira email address"),
         api_token: str = Query(..., description="Your Jira API token")
 ):
+    # Private: the body was fetched with the caller's own Jira credentials
+    cache_headers = {"Cache-Control": f"private, max-age={JIRA_CACHE_TTL}"}
+    cache_key = _jira_cache_key(jira_url, email, api_token)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Clients echo back the weak tag we sent; Jira and the cache hold Jira's own tag
+        if_none_match = _strong_etag(if_none_match)
+    cached = _jira_cache_get(cache_key)
+    if cached is not None:
+        body, etag, seconds_left = cached
+        # Only the time left on our entry, so browser and server caching together stay within the TTL
+        cache_headers["Cache-Control"] = f"private, max-age={seconds_left}"
+        if etag:
+            cache_headers["ETag"] = _weak_etag(etag)
+            if if_none_match == _strong_etag(etag):
+                return Response(status_code=304, headers=cache_headers)
+        return Response(content=body, media_type="application/json", headers=cache_headers)
+
+    # Forward the client's ETag so an unchanged result comes back as a bodyless 304 that is never re-flattened
+    jira_headers = {"Authorization": _basic_auth(email, api_token)}
+    if if_none_match:
+        jira_headers["If-None-Match"] = if_none_match
+
     try:
-        response = requests.get(jira_url, auth=HTTPBasicAuth(email, api_token), headers={"Accept": "application/json"})
-        response.raise_for_status()
-        data = response.json()
-        table_data = []
-        for issue in data.get("issues", []):
-            fields = issue.get("fields", {})
-            issue_type = fields.get("issuetype", {}).get("name", "")
-            parent_key = None if issue_type == "Epic" else fields.get("parent", {}).get("key")
-            entry = {
-                "issue_key": issue.get("key", ""),
-                "summary": fields.get("summary", ""),
-                "issue_type": issue_type,
-                "parent": parent_key,
-                "status": fields.get("status", {}).get("name", ""),
-                "assignee": fields.get("assignee", {}).get("displayName", "N/A") if fields.get("assignee") else "N/A",
-                "reporter": fields.get("reporter", {}).get("displayName", "N/A") if fields.get("reporter") else "N/A",
-            }
-            table_data.append(entry)
-        return {"data": table_data}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        response = await request.app.state.http.get(jira_url, headers=jira_headers)
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=502, detail=f"Upstream error: {e}") from None
+
+    etag = response.headers.get("ETag")
+    if etag:
+        cache_headers["ETag"] = _weak_etag(etag)
+    if response.status_code == 304:
+        return Response(status_code=304, headers=cache_headers)
+    if not response.is_success:
+        raise _jira_error(response, jira_url)
+
+    try:
+        data = orjson.loads(response.content)
+        table_data = flatten_issues(data.get("issues", []))
+    except (orjson.JSONDecodeError, AttributeError, TypeError):
+        # An HTML login or proxy page served with a 2xx status, or JSON that is not a search result
+        raise HTTPException(status_code=502, detail=f"Unexpected Jira response for {jira_url}") from None
+    body = orjson.dumps({"data": table_data})
+    _jira_cache_put(cache_key, body, etag)
+    return Response(content=body, media_type="application/json", headers=cache_headers)
+
+
+@app.get("/simplified-jira-issues/stream")
+async def stream_simplified_issues(
+        request: Request,
+        jira_url: str = Query(..., description="Jira API URL"),
+        email: str = Query(..., description="Your Jira email address"),
+        api_token: str = Query(..., description="Your Jira API token")
+):
+    """
+    Streams the simplified issue table while the Jira response is still downloading,
+    so large projects are never buffered or parsed as a whole.
+    """
+    client = request.app.state.http
+    try:
+        upstream = await client.send(
+            client.build_request(
+                "GET",
+                jira_url,
+                headers={"Authorization": _basic_auth(email, api_token)},
+            ),
+            stream=True,
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=502, detail=f"Upstream error: {e}") from None
+    if not upstream.is_success:
+        await upstream.aclose()
+        raise _jira_error(upstream, jira_url)
+    if "application/json" not in upstream.headers.get("content-type", ""):
+        # Checked before anything is sent: once the 200 and '{"data":[' go out, an HTML
+        # login page could only surface as a truncated body
+        await upstream.aclose()
+        raise HTTPException(status_code=502, detail=f"Unexpected Jira response for {jira_url}")
+
+    async def generate():
+        # Closed here rather than in a background task, which Starlette skips on
+        # client disconnects and on errors raised while streaming
+        try:
+            # ijson's push parser collects every complete issue seen so far into `issues`
+            issues = ijson.sendable_list()
+            parser = ijson.items_coro(issues, "issues.item", use_float=True)
+            separator = b""
+            yield b'{"data":['
+            async for chunk in upstream.aiter_bytes():
+                parser.send(chunk)
+                for issue in issues:
+                    yield separator + orjson.dumps(flatten_issue(issue))
+                    separator = b","
+                del issues[:]
+            parser.close()
+            for issue in issues:
+                yield separator + orjson.dumps(flatten_issue(issue))
+                separator = b","
+            yield b"]}"
+        finally:
+            await upstream.aclose()
+
+    return StreamingResponse(generate(), media_type="application/json")
 
 
 # --- NEW: Database Query Endpoints ---
 
-@app.get("/requests", response_model=List[GenerationRequestResponse])
+def _response_columns(model, response_model):
+    """
+    Selects only the table columns exposed by a response model, so list endpoints
+    read plain rows instead of hydrating full ORM objects. The rows are dumped
+    straight to JSON; the response models are kept for the OpenAPI docs only.
+    """
+    return [model.__table__.c[name] for name in response_model.model_fields]
+
+
+def _paged_select(model, response_model):
+    """
+    Builds a paginated SELECT of a model's response columns as a lambda statement,
+    so SQLAlchemy compiles it once and each request only binds skip and limit.
+    """
+    columns = _response_columns(model, response_model)
+    return lambda_stmt(lambda: select(*columns)).add_criteria(
+        lambda s: s.offset(bindparam("skip")).limit(bindparam("limit"))
+    )
+
+
+_REQUESTS_PAGE = _paged_select(GenerationRequestDB, GenerationRequestResponse)
+_CLASSIFICATIONS_PAGE = _paged_select(ClassificationLogDB, ClassificationLogResponse)
+_TICKETS_PAGE = _paged_select(GeneratedTicketDB, GeneratedTicketResponse)
+
+
+@app.get("/requests", response_model=None, responses={200: {"model": List[GenerationRequestResponse]}})
 def get_all_requests(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """
     Retrieves all initial generation requests from the database.
     """
-    requests = db.query(GenerationRequestDB).offset(skip).limit(limit).all()
-    return requests
+    requests = db.execute(_REQUESTS_PAGE, {"skip": skip, "limit": limit}).mappings().all()
+    return ORJSONResponse([dict(row) for row in requests])
+
+
+@app.get("/requests/stream")
+def stream_all_requests():
+    """
+    Streams every generation request as newline-delimited JSON, reading rows from
+    the database in batches instead of loading the whole table at once.
+    """
+    stmt = select(*_response_columns(GenerationRequestDB, GenerationRequestResponse)).execution_options(yield_per=1000)
+
+    def generate():
+        # The session is owned by the generator so it stays open while the body streams
+        db = SessionLocal()
+        try:
+            for row in db.execute(stmt).mappings():
+                yield orjson.dumps(dict(row)) + b"\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 
-@app.get("/classifications", response_model=List[ClassificationLogResponse])
+@app.get("/classifications", response_model=None, responses={200: {"model": List[ClassificationLogResponse]}})
 def get_all_classifications(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """
     Retrieves all classification (gatekeeper) logs from the database.
     """
-    classifications = db.query(ClassificationLogDB).offset(skip).limit(limit).all()
-    return classifications
+    classifications = db.execute(_CLASSIFICATIONS_PAGE, {"skip": skip, "limit": limit}).mappings().all()
+    return ORJSONResponse([dict(row) for row in classifications])
 
 
-@app.get("/tickets", response_model=List[GeneratedTicketResponse])
+@app.get("/tickets", response_model=None, responses={200: {"model": List[GeneratedTicketResponse]}})
 def get_all_tickets(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """
     Retrieves all successfully generated Jira ticket logs from the database.
     """
-    tickets = db.query(GeneratedTicketDB).offset(skip).limit(limit).all()
-    return tickets
+    tickets = db.execute(_TICKETS_PAGE, {"skip": skip, "limit": limit}).mappings().all()
+    return ORJSONResponse([dict(row) for row in tickets])
 
 
 @app.get("/full_log/{request_id}", response_model=FullLogResponse)
-def get_full_log_by_request_id(request_id: int, db: Session = Depends(get_db)):
+async def get_full_log_by_request_id(request_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieves the complete audit trail for a single request, including the
     initial request, its classification, and the final ticket if created.
     """
-    request = db.query(GenerationRequestDB).filter(GenerationRequestDB.request_id == request_id).first()
+    stmt = (
+        select(GenerationRequestDB)
+        .options(
+            joinedload(GenerationRequestDB.classification),
+            # Skip the raw generated JSON and other columns the ticket response never exposes
+            joinedload(GenerationRequestDB.ticket).load_only(
+                *(getattr(GeneratedTicketDB, name) for name in GeneratedTicketResponse.model_fields),
+                raiseload=True,
+            ),
+        )
+        .filter_by(request_id=request_id)
+    )
+    request = (await db.execute(stmt)).scalars().first()
     if not request:
         raise HTTPException(status_code=404, detail="Request not found")
 
-    classification = db.query(ClassificationLogDB).filter(ClassificationLogDB.request_id == request_id).first()
-    ticket = db.query(GeneratedTicketDB).filter(GeneratedTicketDB.request_id == request_id).first()
-
     return FullLogResponse(
         request=request,
-        classification=classification,
-        ticket=ticket
+        classification=request.classification,
+        ticket=request.ticket
     )
+
+
+if __name__ == "__main__":
+    uvicorn.run("main:app", host="0.0.0.0", port=8080, loop="uvloop", http="httptools", workers=settings.web_concurrency)